@@ -0,0 +1,200 @@
+import argparse
+import io
+import math
+import sys
+import time
+import tracemalloc
+
+import matplotlib
+matplotlib.use('Agg')
+
+import check_import
+from matplotlib_exact import Alignment
+
+
+SIZES = (1, 5, 10, 20, 50)
+SPACE = 0.05
+WIDTH = 0.5
+HEIGHT = 0.4
+
+
+def new_alignment(n, **kwargs):
+  return Alignment(n, n, size=(WIDTH, HEIGHT), spacings=SPACE, pyplot=False, **kwargs)
+
+
+def empty_alignment(n):
+  return Alignment(n, n, pyplot=False)
+
+
+def close(alignment):
+  if isinstance(alignment, Alignment):
+    alignment.close()
+
+
+# Benchmarks return (setup, run, reuse). Setup is excluded from timings and
+# reused across repeats when the run leaves the alignment equivalent.
+
+def bench_construct(n):
+  return (lambda: None), (lambda _: close(new_alignment(n))), True
+
+
+def bench_configure(n):
+
+  def run(alignment):
+    for a in alignment.flatten():
+      a.set_spacing(every=SPACE)
+      a.set_width(WIDTH)
+      a.set_height(HEIGHT)
+
+  return (lambda: empty_alignment(n)), run, False
+
+
+def bench_configure_batch(n):
+
+  def run(alignment):
+    with alignment.batch():
+      for a in alignment.flatten():
+        a.set_spacing(every=SPACE)
+        a.set_width(WIDTH)
+        a.set_height(HEIGHT)
+
+  return (lambda: empty_alignment(n)), run, False
+
+
+def bench_reshape(n):
+
+  def run(alignment):
+    alignment.reshape(n * n, 1)
+    alignment.reshape(n, n)
+
+  return (lambda: new_alignment(n)), run, True
+
+
+def bench_add_rows(n):
+  return (lambda: new_alignment(n)), (lambda a: a.add_rows(1, size=(WIDTH, HEIGHT), spacings=SPACE)), False
+
+
+def bench_add_columns(n):
+  return (lambda: new_alignment(n)), (lambda a: a.add_columns(1, size=(WIDTH, HEIGHT), spacings=SPACE)), False
+
+
+def bench_grow(n):
+
+  def run(alignment):
+    for _ in range(n - 1):
+      alignment.add_rows(1, size=(WIDTH, HEIGHT), spacings=SPACE)
+
+  return (lambda: Alignment(1, n, size=(WIDTH, HEIGHT), spacings=SPACE, layout_only=True)), run, False
+
+
+def bench_relayout(n):
+
+  def run(alignment):
+    alignment.mark_dirty()
+    alignment.update()
+
+  return (lambda: new_alignment(n, layout_only=True)), run, True
+
+
+def bench_edit(n):
+
+  def run(alignment):
+    a = alignment[0][0]
+    a.set_left(SPACE * 2 if a.left() == SPACE else SPACE)
+
+  return (lambda: new_alignment(n)), run, True
+
+
+def bench_annotate(n):
+  return (lambda: new_alignment(n)), (lambda a: a.annotate()), True
+
+
+def bench_save(fmt):
+
+  def bench(n):
+    return (lambda: new_alignment(n)), (lambda a: a.figure().savefig(io.BytesIO(), format=fmt)), True
+
+  return bench
+
+
+BENCHMARKS = {
+  'construct': bench_construct,
+  'configure': bench_configure,
+  'configure_batch': bench_configure_batch,
+  'reshape': bench_reshape,
+  'add_rows': bench_add_rows,
+  'add_columns': bench_add_columns,
+  'grow': bench_grow,
+  'relayout': bench_relayout,
+  'edit': bench_edit,
+  'annotate': bench_annotate,
+  'save_png': bench_save('png'),
+  'save_pdf': bench_save('pdf'),
+  'save_svg': bench_save('svg'),
+}
+
+
+def measure(setup, run, reuse, min_time=0.2, max_repeat=1000):
+
+  # The untimed warm-up run doubles as the peak memory measurement.
+  state = setup()
+  tracemalloc.start()
+  run(state)
+  peak = tracemalloc.get_traced_memory()[1]
+  tracemalloc.stop()
+  if not reuse:
+    close(state)
+
+  elapsed, repeat = 0.0, 0
+  while repeat < max_repeat and (elapsed < min_time or repeat == 0):
+    if not reuse:
+      state = setup()
+    start = time.perf_counter()
+    run(state)
+    elapsed += time.perf_counter() - start
+    repeat += 1
+    if not reuse:
+      close(state)
+  close(state)
+
+  return repeat / elapsed, peak
+
+
+# Checks.
+
+def check_complexity(name, sizes, min_time, limit=1.2):
+  # Fits the growth exponent of per-op time against the number of cells.
+  small, large = sizes
+  small_ops, _ = measure(*BENCHMARKS[name](small), min_time=min_time)
+  large_ops, _ = measure(*BENCHMARKS[name](large), min_time=min_time)
+  exponent = math.log(small_ops / large_ops) / math.log((large * large) / (small * small))
+  ok = exponent < limit
+  print(f'{"ok" if ok else "FAIL":<4} {name} scales as cells^{exponent:.2f} ({small}x{small} -> {large}x{large}, limit {limit})')
+  return ok
+
+
+def main():
+
+  parser = argparse.ArgumentParser(description='Benchmark matplotlib_exact layout, annotation and rendering.')
+  parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES))
+  parser.add_argument('--benchmarks', nargs='+', default=list(BENCHMARKS), choices=list(BENCHMARKS))
+  parser.add_argument('--min-time', type=float, default=0.2)
+  parser.add_argument('--check-only', action='store_true')
+  args = parser.parse_args()
+
+  if not args.check_only:
+    print(f'{"benchmark":<16} {"grid":>7} {"ops/sec":>12} {"peak MiB":>10}')
+    for name in args.benchmarks:
+      for n in args.sizes:
+        ops, peak = measure(*BENCHMARKS[name](n), min_time=args.min_time)
+        print(f'{name:<16} {f"{n}x{n}":>7} {ops:>12.2f} {peak / 2 ** 20:>10.2f}')
+    print()
+
+  ok = check_import.check()
+  ok &= check_complexity('relayout', (10, 50), args.min_time)
+  ok &= check_complexity('edit', (10, 40), args.min_time)
+  sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,46 @@
+import argparse
+import json
+import subprocess
+import sys
+
+
+# Seconds that import matplotlib_exact may take in a fresh interpreter,
+# numpy included.
+BUDGET = 0.5
+
+CODE = '''
+import json, sys, time
+start = time.perf_counter()
+import matplotlib_exact
+elapsed = time.perf_counter() - start
+print(json.dumps(dict(elapsed=elapsed, loaded=[m for m in ('matplotlib', 'matplotlib.pyplot') if m in sys.modules])))
+'''
+
+
+def check(budget=BUDGET):
+  result = subprocess.run([sys.executable, '-c', CODE], capture_output=True, text=True)
+  if result.returncode != 0:
+    print(f'FAIL import matplotlib_exact raised\n{result.stderr}')
+    return False
+  data = json.loads(result.stdout)
+  ok = True
+  if data['loaded']:
+    print(f'FAIL import matplotlib_exact loads {", ".join(data["loaded"])}')
+    ok = False
+  if data['elapsed'] > budget:
+    print(f'FAIL import matplotlib_exact takes {data["elapsed"] * 1000:.0f} ms, budget {budget * 1000:.0f} ms')
+    ok = False
+  if ok:
+    print(f'ok   import matplotlib_exact loads no matplotlib modules ({data["elapsed"] * 1000:.0f} ms, budget {budget * 1000:.0f} ms)')
+  return ok
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Check that importing matplotlib_exact stays cheap.')
+  parser.add_argument('--budget', type=float, default=BUDGET, help='import time budget in seconds')
+  args = parser.parse_args()
+  sys.exit(0 if check(args.budget) else 1)
+
+
+if __name__ == '__main__':
+  main()
@@ -1 +1,5 @@
-from .alignment import Alignment
\ No newline at end of file
+from .alignment import Alignment
+from .cache import LayoutCache
+from .image import ImageCache
+from .render import render_many
+from .text import TextCache
\ No newline at end of file
@@ -1,27 +1,79 @@
-import matplotlib.pyplot
+import contextlib
+import json
+import logging
 import numpy
+from .annotation import SIDES, Annotations
 from .axes import Axes
-from matplotlib.lines import Line2D
+from .cache import default_cache
+from .fit import fit_sizes
+from .geometry import Geometry, reserve
+from .instrumentation import Instrumentation
+from .layout import Layout
+from .text import default_text_cache
 
 
-class Alignment:
+logger = logging.getLogger(__name__)
+
 
-  def __init__(self, nrows, ncols, size=None, spacings=None, width=None, height=None, left=None, right=None, top=None, bottom=None, every=None):
+class Alignment:
 
-    self._figure = matplotlib.pyplot.figure(dpi=200)
+  resize_tolerance = 1e-6
+
+  def __init__(self, nrows, ncols, size=None, spacings=None, width=None, height=None, left=None, right=None, top=None, bottom=None, every=None, layout_only=False, figure=None, pyplot=True, cache=None, pooled=False, sparse=False):
+
+    self._figure = None
+    self._cache = default_cache if cache is True else cache
+    self._cache_key = None
+    self._pooled = pooled
+    self._pool_stats = dict(hits=0, misses=0, axes_reused=0)
+    self._snap = None
+    self._sparse = sparse
+    self._host = None
+    self._placement = None
+    self._owns_figure = False
+    self._pyplot = False
+    if figure is not None or not layout_only:
+      self._set_figure(figure, pyplot=pyplot)
     self._nrows = None
     self._ncols = None
-    self._left, self._right, self._top, self._bottom = None, None, None, None
     self._array = None
+    self._materialized = None
+    self._cells = None
+    self._mask = None
+    self._geometry = None
+    self._layout = None
+    self._applied = None
+    self._sized = None
+    self._dirty = None
+    self._touched = 0
+    self._instrumentation = None
     self.text_annotation = None
     self.rect_annotation = None
+    self._annotations = None
     self.post_update_functions = []
+    self._frozen = 0
+    self._pending = False
     self.reset(nrows, ncols, size=size, spacings=spacings, width=width, height=height, left=left, right=right, top=top, bottom=bottom, every=every)
 
   def reset(self, nrows, ncols, size=None, spacings=None, width=None, height=None, left=None, right=None, top=None, bottom=None, every=None):
 
     self.post_update_functions = []
-    self.figure().clear()
+    for a in self.flatten():
+      if a.child() is not None:
+        a.set_child(None)
+    reuse = self._pooled and self.figure() is not None and (nrows, ncols) == (self.nrows(), self.ncols())
+    if reuse:
+      self.recycle()
+    else:
+      if self._pooled:
+        self._pool_stats['misses'] += 1
+      # Only a figure this alignment created is cleared; in a shared one the
+      # caller's axes and artists stay.
+      if self._host is not None or not self._owns_figure:
+        self.remove_axes()
+      elif self.figure() is not None:
+        self.figure().clear()
+      self._annotations = None
 
     if size is not None:
       width, height = size[0], size[1]
@@ -32,42 +84,108 @@ class Alignment:
       else:
         every = spacings
 
-    self._nrows = nrows
-    self._ncols = ncols
-    self._left, self._right, self._top, self._bottom = [], [], [], []
-    self._array = numpy.empty(shape=(nrows, ncols), dtype=object)
-    self.calculate_edges()
+    with self.batch():
+      if reuse:
+        self._geometry.clear()
+        self.mark_dirty()
+      else:
+        self._nrows = nrows
+        self._ncols = ncols
+        self._cells = self._array = numpy.empty(shape=(nrows, ncols), dtype=object)
+        self._mask = self._materialized = numpy.zeros(shape=(nrows, ncols), dtype=bool)
+        self._geometry = Geometry(nrows, ncols)
+        self._applied = None
+        self.calculate_edges()
+      self.clear_annotations()
+      self.set_sizes(width=width, height=height)
+      self.set_spacings(left=left, right=right, top=top, bottom=bottom, every=every)
+      self.update()
+
+  def recycle(self):
+    # Keeps the matplotlib axes of every cell and only drops what was drawn on them.
     self.clear_annotations()
-    self.set_sizes(width=width, height=height)
-    self.set_spacings(left=left, right=right, top=top, bottom=bottom, every=every)
-    self.update()
-
-  def calculate_edges(self):
-
-    self._left, self._right, self._top, self._bottom = [], [], [], []
+    fig = self.figure()
+    keep = []
+    if self._annotations is not None:
+      keep = [self._annotations.rects(), self._annotations.lines()]
+    for artist in [*fig.texts, *fig.lines, *fig.patches, *fig.images, *fig.legends, *fig.artists]:
+      if not any(artist is k for k in keep):
+        artist.remove()
+    reused = 0
+    for a in self.flatten():
+      reused += a.recycle()
+    self._pool_stats['hits'] += 1
+    self._pool_stats['axes_reused'] += reused
+    return reused
 
-    for row_idx, row in enumerate(self.array()):
+  def set_pooled(self, pooled):
+    self._pooled = pooled
 
-      for col_idx, value in (enumerate(row)):
+  def pooled(self):
+    return self._pooled
 
-        if value is None:
-          value = Axes(self)
-        self.array()[row_idx][col_idx] = value
+  def pool_stats(self):
+    return dict(self._pool_stats)
 
-        if row_idx in [0]:
-          self._top.append(value)
+  def calculate_edges(self):
 
-        if row_idx == (self.nrows() - 1):
-          self._bottom.append(value)
+    # Sparse grids only create Axes when a cell is first accessed.
+    array = self.array()
+    for row, col in numpy.argwhere(self._materialized).tolist():
+      array[row, col].set_index(row, col)
+    if not self._sparse:
+      self._materialize((slice(None), slice(None)))
+
+    self.mark_dirty()
+
+  def _materialize(self, index):
+
+    # Fast path for single cells.
+    if isinstance(index, tuple) and len(index) == 2 and all(isinstance(i, (int, numpy.integer)) for i in index):
+      row, col = int(index[0]), int(index[1])
+      if row < 0:
+        row += self.nrows()
+      if col < 0:
+        col += self.ncols()
+      if not self._materialized[row, col]:
+        self._array[row, col] = Axes(self, index=(row, col))
+        self._materialized[row, col] = True
+        self.mark_dirty(row, col)
+      return
+
+    missing = numpy.zeros(shape=self._materialized.shape, dtype=bool)
+    missing[index] = True
+    missing &= ~self._materialized
+    if missing.any():
+      array = self.array()
+      for row, col in numpy.argwhere(missing).tolist():
+        array[row, col] = Axes(self, index=(row, col))
+      self._materialized |= missing
+      self._mark_dirty(missing)
+
+  def _resize(self, nrows, ncols):
+    # Storage grows by doubling and the grid is a view of its top left corner,
+    # so existing cells keep their index and their Axes.
+    self._cells = reserve(self._cells, nrows, ncols, None)
+    self._mask = reserve(self._mask, nrows, ncols, False)
+    self._array = self._cells[:nrows, :ncols]
+    self._materialized = self._mask[:nrows, :ncols]
+    self._geometry.resize(nrows, ncols)
+    self._nrows = nrows
+    self._ncols = ncols
+    self._layout = None
 
-        if col_idx in [0]:
-          self._left.append(value)
+  def sparse(self):
+    return self._sparse
 
-        if col_idx == (len(row) - 1):
-          self._right.append(value)
+  def materialized(self):
+    return self._materialized.copy()
 
   def reshape(self, nrows, ncols):
-    self._array = numpy.reshape(self.array(), (nrows, ncols))
+    self._layout = None
+    self._cells = self._array = numpy.reshape(self.array(), (nrows, ncols))
+    self._mask = self._materialized = numpy.reshape(self._materialized, (nrows, ncols))
+    self._geometry.reshape(nrows, ncols)
     self._nrows = nrows
     self._ncols = ncols
     self.calculate_edges()
@@ -82,84 +200,304 @@ class Alignment:
   def figure(self):
     return self._figure
 
+  def layout_only(self):
+    return self.figure() is None
+
+  def attach(self, figure=None, pyplot=True):
+    # Axes are created again in the new figure.
+    previous = self.figure()
+    if previous is not None:
+      self.remove_axes()
+      if self._owns_figure and self._pyplot:
+        import matplotlib.pyplot
+        matplotlib.pyplot.close(previous)
+    self._set_figure(figure, pyplot=pyplot)
+    for a in self.flatten():
+      if a.child() is not None:
+        a.child().attach(self.figure())
+    self._applied = None
+    self.mark_dirty()
+    return self.update()
+
+  def _set_figure(self, figure=None, pyplot=True):
+    self._owns_figure = figure is None
+    self._pyplot = figure is None and pyplot
+    if figure is None:
+      if pyplot:
+        import matplotlib.pyplot
+        figure = matplotlib.pyplot.figure(dpi=200)
+      else:
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        figure = Figure(dpi=200)
+        FigureCanvasAgg(figure)
+    self._figure = figure
+    self._sized = None
+    self._annotations = None
+
+  def remove_axes(self):
+    # Removes the matplotlib axes of every cell, e.g. when a nested alignment
+    # leaves a figure it shares with its parent.
+    for a in self.flatten():
+      if a.child() is not None:
+        a.child().remove_axes()
+      if a._matplotlib is not None:
+        a.clear_annotations()
+        a._matplotlib.remove()
+        a._matplotlib = None
+    if self._annotations is not None:
+      self._annotations.rects().remove()
+      self._annotations.lines().remove()
+      self._annotations = None
+    self._applied = None
+
+  def host(self):
+    return self._host
+
+  def set_host(self, host):
+    self._host = host
+    self._placement = None
+
+  def root(self):
+    alignment = self
+    while alignment.host() is not None:
+      alignment = alignment.host().alignment()
+    return alignment
+
+  def origin(self):
+    # Bottom left corner in inches from the bottom left of the root figure.
+    if self._host is None:
+      return 0.0, 0.0
+    parent = self._host.alignment()
+    x, y = parent.origin()
+    dx, dy = parent.positions()[self._host.index()][:2]
+    return x + float(dx), y + float(dy)
+
+  def _sync_host(self):
+    # A nested alignment sets the size of the cell that hosts it.
+    host = self._host
+    width, height = self.figure_size()
+    g, index = host.geometry(), host.index()
+    if g.width[index] == width and g.height[index] == height:
+      return False
+    g.width[index] = width
+    g.height[index] = height
+    host.alignment().mark_dirty(*index)
+    return True
+
+  def close(self):
+    fig = self.figure()
+    for a in self.flatten():
+      if a.child() is not None:
+        a.child().close()
+      a.clear_annotations()
+      a._matplotlib = None
+    self.text_annotation = None
+    self.rect_annotation = None
+    self._annotations = None
+    self._figure = None
+    self._applied = None
+    if fig is not None and self._owns_figure:
+      fig.clear()
+      if self._pyplot:
+        import matplotlib.pyplot
+        matplotlib.pyplot.close(fig)
+    self._owns_figure = False
+    self._pyplot = False
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
   def array(self):
     return self._array
 
   def left(self):
-    return self._left
+    return self[:, 0]
 
   def right(self):
-    return self._right
-  
+    return self[:, -1]
+
   def top(self):
-    return self._top
-  
+    return self[0, :]
+
   def bottom(self):
-    return self._bottom
+    return self[-1, :]
 
-  def array(self):
-    return self._array
+  def geometry(self):
+    return self._geometry
+
+  def layout(self):
+    if self._layout is None:
+      ins = self._instrumentation
+      if ins is None:
+        self._layout = self._solve()
+      else:
+        ins.count('layouts')
+        with ins.trace('layout'):
+          self._layout = self._solve()
+    return self._layout
+
+  def _solve(self):
+    g = self.geometry()
+    arrays = (g.width, g.height, g.left, g.right, g.top, g.bottom)
+    if self._cache is None or self._cache_key is None:
+      layout = Layout(*arrays)
+    else:
+      layout = self._cache.solve(*arrays, key=self._cache_key)
+    if self._snap is not None:
+      layout = layout.snapped(self._snap)
+    return layout
+
+  def snap_to_pixels(self, dpi=None, enabled=True):
+    if enabled and dpi is None:
+      if self.figure() is None:
+        raise ValueError('dpi is required without a figure')
+      dpi = self.figure().dpi
+    self._snap = float(dpi) if enabled else None
+    if enabled and self.figure() is not None:
+      self.figure().set_dpi(dpi)
+    self.mark_dirty()
+    self.update()
+
+  def snap_dpi(self):
+    return self._snap
+
+  def snap_error(self):
+    return self.layout().rounding_error()
+
+  def set_cache(self, cache):
+    self._cache = default_cache if cache is True else cache
+    self._layout = None
+
+  def cache(self):
+    return self._cache
+
+  def spec(self):
+    g = self.geometry()
+    spec = dict(shape=(self.nrows(), self.ncols()))
+    for name in Geometry.fields:
+      spec[name] = getattr(g, name).copy()
+    active = numpy.zeros(shape=spec['shape'], dtype=bool)
+    for a in self.flatten():
+      active[a.index()] = a._matplotlib is not None
+    spec['active'] = active
+    return spec
+
+  def load_spec(self, spec):
+    nrows, ncols = spec['shape']
+    with self.batch():
+      if (nrows, ncols) != (self.nrows(), self.ncols()):
+        self.reset(nrows, ncols)
+      g = self.geometry()
+      for name in Geometry.fields:
+        getattr(g, name)[...] = numpy.array(spec[name], dtype=float)
+      self.mark_dirty()
+      # Hashed once per spec; any later edit drops the key.
+      if self._cache is not None:
+        self._cache_key = self._cache.key(g.width, g.height, g.left, g.right, g.top, g.bottom)
+      self.update()
+    if self.figure() is not None and 'active' in spec:
+      for a in self[numpy.array(spec['active'], dtype=bool)]:
+        a.matplotlib()
+
+  @classmethod
+  def from_spec(cls, spec, **kwargs):
+    nrows, ncols = spec['shape']
+    alignment = cls(nrows, ncols, **kwargs)
+    alignment.load_spec(spec)
+    return alignment
+
+  def to_json(self):
+    spec = self.spec()
+    data = dict(shape=list(spec['shape']), active=spec['active'].tolist())
+    for name in Geometry.fields:
+      data[name] = [[None if numpy.isnan(v) else v for v in row] for row in spec[name].tolist()]
+    return json.dumps(data, separators=(',', ':'))
+
+  @classmethod
+  def from_json(cls, text, **kwargs):
+    return cls.from_spec(json.loads(text), **kwargs)
 
   def spacing_width(self):
-    fig_w = 0.0
-    for r, row in enumerate(self):
-      row_w = 0.0
-      for c, ax in enumerate(row):
-        w = ax.spacing_width()
-        row_w += w
-        if row_w > fig_w:
-          fig_w = row_w
-    return fig_w
+    return self.spacing_size()[0]
 
   def spacing_height(self):
-    fig_h = 0.0
-    for r, row in enumerate(self):
-      row_h = 0.0
-      for c, ax in enumerate(row):
-        h = ax.spacing_height()
-        if h > row_h:
-          row_h = h
-      fig_h += row_h
-    return fig_h
+    return self.spacing_size()[1]
 
   def spacing_size(self):
-    return self.spacing_width(), self.spacing_height()
+    g = self.geometry()
+    zeros = numpy.zeros(shape=g.shape())
+    layout = Layout(zeros, zeros, g.left, g.right, g.top, g.bottom)
+    return layout.figure_size()
 
   def figure_width(self):
-    fig_w = 0.0
-    for r, row in enumerate(self):
-      row_w = 0.0
-      for c, ax in enumerate(row):
-        w = ax.total_width()
-        row_w += w
-        if row_w > fig_w:
-          fig_w = row_w
-    return fig_w
+    return self.layout().figure_width()
 
   def figure_height(self):
-    fig_h = 0.0
-    for r, row in enumerate(self):
-      row_h = 0.0
-      for c, ax in enumerate(row):
-        h = ax.total_height()
-        if h > row_h:
-          row_h = h
-      fig_h += row_h
-    return fig_h
+    return self.layout().figure_height()
 
   def figure_size(self):
-    return self.figure_width(), self.figure_height()
+    return self.layout().figure_size()
+
+  def resize_figure(self):
+    layout = self.layout()
+    fig = self.figure()
+    if fig is None or self._host is not None or self._sized is layout:
+      return False
+    self._sized = layout
+    size = layout.figure_size()
+    if numpy.allclose(fig.get_size_inches(), size, rtol=0.0, atol=self.resize_tolerance):
+      return False
+    logger.debug('Resizing figure: (%.2f, %.2f)', size[0], size[1])
+    fig.set_size_inches(size)
+    self._count('figure_resizes')
+    return True
+
+  def positions(self):
+    return self.layout().positions()
+
+  def fractions(self):
+    if self._host is None:
+      return self.layout().fractions()
+
+    # Nested alignments are placed inside the root figure. Their own layout
+    # stays cached; only this offset changes when the parent moves them.
+    layout = self.layout()
+    key = (layout, self.origin(), self.root().figure_size())
+    if self._placement is None or self._placement[0] != key:
+      size = numpy.array(key[2] * 2)
+      scale = numpy.divide(1.0, size, out=numpy.zeros_like(size), where=size > 0)
+      offset = numpy.array(key[1] + (0.0, 0.0))
+      self._placement = (key, (layout.positions() + offset) * scale)
+    return self._placement[1]
 
   def annotate(self):
-    x = 0.75
-    if self.nrows() > 1:
-      x = (self.nrows() - 1)/self.nrows()
-    y = 1 - x
-    self.annotate_rect(x=x, y=y)
-    self.annotate_text(x=x, y=y)
+    ins = self._instrumentation
+    if ins is None:
+      return self._annotate()
+    with ins.trace('annotate'):
+      return self._annotate()
+
+  def _annotate(self):
+    if self._host is None:
+      x = 0.75
+      if self.nrows() > 1:
+        x = (self.nrows() - 1)/self.nrows()
+      y = 1 - x
+      self.annotate_rect(x=x, y=y)
+      self.annotate_text(x=x, y=y)
     for a in self.flatten():
       a.annotate()
 
+  def annotations(self, create=False):
+    if self._annotations is None and create and self.figure() is not None:
+      self._annotations = Annotations(self)
+      self._count('artists_created', 2)
+    return self._annotations
+
   def clear_annotations(self):
     self.clear_text_annotations()
     self.clear_rect_annotations()
@@ -172,6 +510,7 @@ class Alignment:
       for line in self.rect_annotation:
         if line in fig.artists:
           fig.artists.remove(line)
+          self._count('artists_removed')
       self.rect_annotation = None
 
   def clear_text_annotations(self):
@@ -179,10 +518,14 @@ class Alignment:
     if fig and self.text_annotation:
       if self.text_annotation in fig.texts:
         fig.texts.remove(self.text_annotation)
+        self._count('artists_removed')
       self.text_annotation = None
 
   def annotate_rect(self, x=0.5, y=0.5, ls=':', lw=1, color='k', alpha=0.5):
     fig = self.figure()
+    if fig is None:
+      return
+    from matplotlib.lines import Line2D
     self.clear_rect_annotations()
     line1 = fig.add_artist(Line2D(
       [x, x], 
@@ -201,9 +544,12 @@ class Alignment:
       alpha=alpha)
     )
     self.rect_annotation = [line1, line2]
+    self._count('artists_created', 2)
 
   def annotate_text(self, x=0.5, y=0.5, fontsize='xx-small', bgcolor='white', bgalpha=0.5):
     fig = self.figure()
+    if fig is None:
+      return
     self.clear_text_annotations()
     fig_w, fig_h = fig.get_size_inches()
     text = f'Figure:\n{fig_w:.2f}x{fig_h:.2f}"'
@@ -219,55 +565,279 @@ class Alignment:
         alpha=bgalpha)
       )
     self.text_annotation = text
+    self._count('artists_created')
 
   def set_leftmost_spacings(self, left=None, right=None, top=None, bottom=None, every=None):
-    for a in self.left():
-      a.set_spacing(left=left, right=right, top=top, bottom=bottom, every=every)
+    self._set_spacings((slice(None), 0), left=left, right=right, top=top, bottom=bottom, every=every)
 
   def set_rightmost_spacings(self, left=None, right=None, top=None, bottom=None, every=None):
-    for a in self.right():
-      a.set_spacing(left=left, right=right, top=top, bottom=bottom, every=every)
+    self._set_spacings((slice(None), -1), left=left, right=right, top=top, bottom=bottom, every=every)
 
   def set_topmost_spacings(self, left=None, right=None, top=None, bottom=None, every=None):
-    for a in self.top():
-      a.set_spacing(left=left, right=right, top=top, bottom=bottom, every=every)
+    self._set_spacings((0, slice(None)), left=left, right=right, top=top, bottom=bottom, every=every)
 
   def set_bottommost_spacings(self, left=None, right=None, top=None, bottom=None, every=None):
-    for a in self.bottom():
-      a.set_spacing(left=left, right=right, top=top, bottom=bottom, every=every)
-
-  def set_spacings(self, left=None, right=None, top=None, bottom=None, every=None):
-    for a in self.flatten():
-      a.set_spacing(left=left, right=right, top=top, bottom=bottom, every=every)
+    self._set_spacings((-1, slice(None)), left=left, right=right, top=top, bottom=bottom, every=every)
+
+  def set_spacings(self, left=None, right=None, top=None, bottom=None, every=None, where=None):
+    self._set_spacings(self._where(where), left=left, right=right, top=top, bottom=bottom, every=every)
+
+  def _set_spacings(self, index, left=None, right=None, top=None, bottom=None, every=None):
+    g = self.geometry()
+    if every is not None:
+      every = self._broadcast(every, index)
+      for array in (g.left, g.right, g.top, g.bottom):
+        array[index] = every
+    for array, value in ((g.left, left), (g.right, right), (g.top, top), (g.bottom, bottom)):
+      if value is not None:
+        array[index] = self._broadcast(value, index)
+    self._mark_dirty(index)
+    self.update()
 
   def set_leftmost_sizes(self, width=None, height=None):
-    for a in self.left():
-      a.set_size(width=width, height=height)
+    self._set_sizes((slice(None), 0), width=width, height=height)
 
   def set_rightmost_sizes(self, width=None, height=None):
-    for a in self.right():
-      a.set_size(width=width, height=height)
+    self._set_sizes((slice(None), -1), width=width, height=height)
 
   def set_topmost_sizes(self, width=None, height=None):
-    for a in self.top():
-      a.set_size(width=width, height=height)
+    self._set_sizes((0, slice(None)), width=width, height=height)
 
   def set_bottommost_sizes(self, width=None, height=None):
-    for a in self.bottom():
-      a.set_size(width=width, height=height)
-
-  def set_sizes(self, width=None, height=None):
+    self._set_sizes((-1, slice(None)), width=width, height=height)
+
+  def set_sizes(self, width=None, height=None, where=None):
+    self._set_sizes(self._where(where), width=width, height=height)
+
+  def _set_sizes(self, index, width=None, height=None):
+    if width is None and height is None:
+      return
+    g = self.geometry()
+    aspect = g.aspect[index]
+    fixed = ~numpy.isnan(aspect) & (aspect != 0)
+    aspect = numpy.where(fixed, aspect, 1.0)
+    if width is not None:
+      g.width[index] = self._broadcast(width, index)
+      g.height[index] = numpy.where(fixed, g.width[index] / aspect, g.height[index])
+    if height is not None:
+      g.height[index] = self._broadcast(height, index)
+      g.width[index] = numpy.where(fixed, g.height[index] * aspect, g.width[index])
+    self._mark_dirty(index)
+    self.update()
+    for a in numpy.ravel(self.array()[index]):
+      if a is not None:
+        a.check_broken_axes()
+
+  def _where(self, where):
+    if where is None:
+      return (slice(None), slice(None))
+    if isinstance(where, tuple):
+      return where
+    mask = numpy.asarray(where)
+    if mask.dtype == bool:
+      return numpy.broadcast_to(mask, self.geometry().shape())
+    return (where, slice(None))
+
+  def _broadcast(self, value, index):
+    value = numpy.asarray(value, dtype=float)
+    shape = self.geometry().shape()
+    selected = numpy.empty(shape)[index].shape
+    if value.shape == selected:
+      return value
+    return numpy.broadcast_to(value, shape)[index]
+
+  def fit(self, figure_size, fixed=None, weights=1.0, aspect=None):
+    # Solves every free width and height at once so that figure_size() is
+    # figure_size. Fixed cells keep their size and cells with an aspect keep
+    # it; a ValueError explains when the size cannot be reached.
+    g = self.geometry()
+    mask = numpy.zeros(shape=g.shape(), dtype=bool)
+    if fixed is not None:
+      mask[self._where(fixed)] = True
+    if aspect is None:
+      aspect = g.aspect
+    aspect = numpy.broadcast_to(numpy.asarray(aspect, dtype=float), g.shape())
+    width, height = fit_sizes(g, float(figure_size[0]), float(figure_size[1]), mask, weights, aspect)
+    g.aspect[...] = aspect
+    g.width[...] = width
+    g.height[...] = height
+    self.mark_dirty()
+    self.update()
     for a in self.flatten():
-      a.set_size(width=width, height=height)
+      a.check_broken_axes()
+
+  def autospace(self, pad=0.0, sides=SIDES, cache=None):
+    # Sets each cell's spacings to what its tick labels, axis labels, titles
+    # and legends need, measured without drawing. Text extents are memoized
+    # across axes and figures, so repeated labels are measured once.
+    fig = self.figure()
+    if fig is None:
+      return
+    cache = default_text_cache if cache is None else cache
+    renderer = cache.renderer(fig.dpi)
+    cells, extents = [], []
+    with self.batch():
+      for a in self.flatten():
+        if a.child() is not None:
+          a.child().autospace(pad=pad, sides=sides, cache=cache)
+          continue
+        ax = a._matplotlib
+        if ax is None or not ax.get_visible():
+          continue
+        tight, box = ax.get_tightbbox(renderer), ax.bbox
+        cells.append(a.index())
+        extents.append((box.x0 - tight.x0, tight.x1 - box.x1, tight.y1 - box.y1, box.y0 - tight.y0))
+      if cells:
+        index = tuple(numpy.array(cells).T)
+        needed = numpy.maximum(numpy.array(extents) / fig.dpi, 0.0) + pad
+        g = self.geometry()
+        for i, side in enumerate(SIDES):
+          if side in sides:
+            getattr(g, side)[index] = needed[:, i]
+        self._mark_dirty(index)
+        self.update()
 
   def set_dpi(self, dpi):
-    self.figure().set_dpi(dpi)
+    if self.figure() is not None:
+      self.figure().set_dpi(dpi)
+    if self._snap is not None:
+      self.snap_to_pixels(dpi)
+
+  def mark_dirty(self, row=None, col=None):
+    if row is None:
+      row = slice(None)
+    if col is None:
+      col = slice(None)
+    self._mark_dirty((row, col))
+
+  def _mark_dirty(self, index):
+    self._cache_key = None
+    shape = (self.nrows(), self.ncols())
+    if self._dirty is None or self._dirty.shape != shape:
+      dirty = numpy.zeros(shape=shape, dtype=bool)
+      if self._dirty is not None:
+        rows, cols = min(shape[0], self._dirty.shape[0]), min(shape[1], self._dirty.shape[1])
+        dirty[:rows, :cols] = self._dirty[:rows, :cols]
+      self._dirty = dirty
+    self._dirty[index] = True
+
+  def dirty(self):
+    return self._dirty
+
+  def touched(self):
+    return self._touched
+
+  def freeze(self):
+    self._frozen += 1
+
+  def thaw(self):
+    if self._frozen > 0:
+      self._frozen -= 1
+    if self._frozen == 0 and self._pending:
+      self.update()
+
+  def frozen(self):
+    return self._frozen > 0
+
+  @contextlib.contextmanager
+  def batch(self):
+    self.freeze()
+    try:
+      yield self
+    finally:
+      self.thaw()
+
+  def instrument(self, enabled=True, hook=None, profiler=None):
+    if not enabled:
+      self._instrumentation = None
+      return None
+    if self._instrumentation is None:
+      self._instrumentation = Instrumentation()
+    if hook is not None:
+      self._instrumentation.add_hook(hook)
+    if profiler is not None:
+      self._instrumentation.set_profiler(profiler)
+    return self._instrumentation
+
+  def instrumentation(self):
+    return self._instrumentation
+
+  def _count(self, name, n=1):
+    if self._instrumentation is not None:
+      self._instrumentation.count(name, n)
+
+  def stats(self):
+    if self._instrumentation is None:
+      return None
+    return self._instrumentation.stats()
 
   def update(self):
-    axes = []
-    for a in self.flatten():
-      ax = a.matplotlib()
-      axes.append(ax)
+    self._layout = None
+    return self.place()
+
+  def place(self):
+    # Applies the layout without solving it again, e.g. when a parent has
+    # only moved this nested alignment.
+    if self.frozen():
+      self._pending = True
+      return None
+    self._pending = False
+    ins = self._instrumentation
+    if ins is None:
+      return self._update()
+    ins.count('updates')
+    with ins.trace('update'):
+      return self._update()
+
+  def _update(self):
+
+    # A nested alignment whose size changed lets its parent update, which in
+    # turn updates this alignment at its new place.
+    if self._host is not None and self._sync_host():
+      parent = self._host.alignment()
+      parent.update()
+      if not parent.frozen():
+        return [a._matplotlib for a in self.flatten()]
+
+    # Without a figure the solved layout is the only output.
+    if self.layout_only():
+      self.layout()
+      for f in self.post_update_functions:
+        f()
+      return []
+
+    # Only revisit cells that were edited or whose rectangle moved. Figure
+    # fractions change for every cell when the figure size changes.
+    self.resize_figure()
+    positions = self.fractions()
+    previous = self._applied
+    if previous is None:
+      touch = numpy.ones(shape=positions.shape[:2], dtype=bool)
+    elif previous.shape != positions.shape:
+      # After growth, cells inside the old grid keep their index.
+      touch = numpy.ones(shape=positions.shape[:2], dtype=bool)
+      rows, cols = min(positions.shape[0], previous.shape[0]), min(positions.shape[1], previous.shape[1])
+      touch[:rows, :cols] = numpy.any(positions[:rows, :cols] != previous[:rows, :cols], axis=-1)
+    else:
+      touch = numpy.any(positions != previous, axis=-1)
+    if self._dirty is not None and self._dirty.shape == touch.shape:
+      touch |= self._dirty
+    touch &= self._materialized
+    array = self.array()
+    for row, col in numpy.argwhere(touch):
+      array[row, col].matplotlib()
+    if self._annotations is not None:
+      self._annotations.invalidate()
+    self._touched = int(touch.sum())
+    self._applied = positions
+    self._dirty = numpy.zeros(shape=touch.shape, dtype=bool)
+
+    axes = [a._matplotlib for a in self.flatten()]
+    if self._pooled:
+      # Recycled axes of cells that are now empty space stay hidden.
+      for a in self.flatten():
+        if a._matplotlib is not None and not (a.width() and a.height()):
+          a._matplotlib.set_visible(False)
     if self.text_annotation is not None and self.rect_annotation is not None:
       self.annotate()
     for f in self.post_update_functions:
@@ -276,12 +846,6 @@ class Alignment:
 
   def add_rows(self, nrows, size=None, spacings=None, width=None, height=None, left=None, right=None, top=None, bottom=None, every=None):
     rows = self.nrows()
-    array = numpy.empty(shape=(nrows, self.ncols()), dtype=object)
-    self._array = numpy.concatenate((self.array(), array))
-    self._nrows = self.nrows() + nrows
-    self.calculate_edges()
-    self.update()
-    axes = self.array()[rows:]
 
     if size is not None:
       width, height = size[0], size[1]
@@ -292,32 +856,18 @@ class Alignment:
       else:
         every = spacings
 
-    for a in axes.flatten():
-      a.set_size(width=width, height=height)
-      a.set_spacing(left=left, right=right, top=top, bottom=bottom, every=every)
+    with self.batch():
+      self._resize(rows + nrows, self.ncols())
+      index = (slice(rows, None), slice(None))
+      self._grown(index)
+      self._set_sizes(index, width=width, height=height)
+      self._set_spacings(index, left=left, right=right, top=top, bottom=bottom, every=every)
+      # Sparse grids return None for the new cells until they are accessed.
+      axes = self.array()[index]
     return axes
 
   def add_columns(self, ncols, size=None, spacings=None, width=None, height=None, left=None, right=None, top=None, bottom=None, every=None):
     cols = self.ncols()
-    array = numpy.empty(shape=(self.nrows(), ncols), dtype=object)
-    self._array = numpy.concatenate((self.array(), array), axis=1)
-    self._ncols = self.ncols() + ncols
-    self.calculate_edges()
-    self.update()
-    axes = self.array()[:, cols:]
-    if size is not None:
-      width, height = size[0], size[1]
-
-    if spacings is not None:
-      if hasattr(spacings, '__iter__'):
-        left, right, top, bottom = spacings[0], spacings[1], spacings[2], spacings[3]
-      else:
-        every = spacings
-
-    for a in axes.flatten():
-      a.set_size(width=width, height=height)
-      a.set_spacing(left=left, right=right, top=top, bottom=bottom, every=every)
-    return axes
 
     if size is not None:
       width, height = size[0], size[1]
@@ -328,11 +878,24 @@ class Alignment:
       else:
         every = spacings
 
-    for a in axes.flatten():
-      a.set_size(width=width, height=height)
-      a.set_spacing(left=left, right=right, top=top, bottom=bottom, every=every)
+    with self.batch():
+      self._resize(self.nrows(), cols + ncols)
+      index = (slice(None), slice(cols, None))
+      self._grown(index)
+      self._set_sizes(index, width=width, height=height)
+      self._set_spacings(index, left=left, right=right, top=top, bottom=bottom, every=every)
+      # Sparse grids return None for the new cells until they are accessed.
+      axes = self.array()[index]
     return axes
 
+  def _grown(self, index):
+    # New cells are the only dirty ones; the rest move only if the layout
+    # moves them.
+    if not self._sparse:
+      self._materialize(index)
+    self._mark_dirty(index)
+    self.update()
+
   def __repr__(self):
     return f'Alignment({self.array()})'
 
@@ -340,14 +903,18 @@ class Alignment:
     return self.array().__len__()
 
   def __getitem__(self, idx):
+    if self._sparse:
+      self._materialize(idx)
     return self.array().__getitem__(idx)
 
   def __iter__(self):
+    if self._sparse:
+      self._materialize((slice(None), slice(None)))
     return self.array().__iter__()
 
   def flatten(self):
     arr = self.array()
     if arr is not None:
-      return self.array().flatten()
+      return arr[self._materialized]
     else:
       return []
\ No newline at end of file
@@ -0,0 +1,133 @@
+import numpy
+
+from .util import lazy_type
+
+
+SIDES = ('left', 'right', 'top', 'bottom')
+COLORS = dict(left='#F16A70', right='#B1D877', top='#8CDCDA', bottom='#4D4D4D')
+
+
+@lazy_type
+def collection_types():
+  from matplotlib.collections import LineCollection, PolyCollection
+
+  class AnnotationPolyCollection(PolyCollection):
+
+    def draw(self, renderer):
+      self.layer.refresh(force=False)
+      super().draw(renderer)
+
+  class AnnotationLineCollection(LineCollection):
+
+    def draw(self, renderer):
+      self.layer.refresh(force=False)
+      super().draw(renderer)
+
+  return AnnotationPolyCollection, AnnotationLineCollection
+
+
+class Annotations:
+
+  def __init__(self, alignment):
+
+    PolyCollection, LineCollection = collection_types()
+    fig = alignment.figure()
+    self._alignment = alignment
+    self._cells = {}
+    self._stale = True
+    self._rects = PolyCollection([], transform=fig.dpi_scale_trans, linewidth=0.0, zorder=-5)
+    self._lines = LineCollection([], transform=fig.dpi_scale_trans, zorder=1)
+    self._rects.layer = self
+    self._lines.layer = self
+    fig.add_artist(self._rects)
+    fig.add_artist(self._lines)
+
+  def rects(self):
+    return self._rects
+
+  def lines(self):
+    return self._lines
+
+  def add(self, axes, spec):
+    self._cells[axes] = spec
+    self._stale = True
+
+  def remove(self, axes):
+    if self._cells.pop(axes, None) is not None:
+      self._stale = True
+
+  def invalidate(self):
+    self._stale = True
+
+  def stale(self):
+    return self._stale
+
+  def refresh(self, force=True):
+
+    if not (force or self._stale):
+      return
+    self._stale = False
+
+    from matplotlib import rcParams
+    from matplotlib.colors import to_rgba_array
+
+    cells = [(axes, spec) for axes, spec in self._cells.items() if axes._matplotlib is not None]
+    if not cells:
+      self._rects.set_verts([])
+      self._lines.set_segments([])
+      return
+
+    a = self._alignment
+    g = a.geometry()
+    rows, cols = numpy.array([axes.index() for axes, _ in cells]).T
+    x, y, w, h = numpy.moveaxis(a.positions()[rows, cols], -1, 0)
+    ox, oy = a.origin()
+    x, y = x + ox, y + oy
+    left, right, top, bottom = g.left[rows, cols], g.right[rows, cols], g.top[rows, cols], g.bottom[rows, cols]
+    sized = (w != 0) & (h != 0)
+
+    # Spacing rectangles, one per annotated side, as (x, y, width, height) in inches.
+    boxes = dict(
+      left=(x - left, y, left, h),
+      right=(x + w, y, right, h),
+      top=(x, y + h, w, top),
+      bottom=(x, y - bottom, w, bottom),
+    )
+    verts, colors, alphas = [], [], []
+    for side in SIDES:
+      mask = sized & numpy.array([spec[side] for _, spec in cells], dtype=bool)
+      bx, by, bw, bh = (numpy.broadcast_to(v, x.shape)[mask] for v in boxes[side])
+      corners = ((bx, by), (bx + bw, by), (bx + bw, by + bh), (bx, by + bh))
+      verts.append(numpy.stack([numpy.stack(c, axis=-1) for c in corners], axis=1))
+      selected = [spec for (_, spec), m in zip(cells, mask) if m]
+      colors += [spec['color'] or COLORS[side] for spec in selected]
+      alphas += [spec['alpha'] or 0.95 for spec in selected]
+    self._rects.set_verts(numpy.concatenate(verts))
+    self._rects.set_facecolor(self._rgba(to_rgba_array, colors, alphas))
+
+    # Center guide lines.
+    mask = sized & numpy.array([spec['center'] for _, spec in cells], dtype=bool)
+    cx, cy = (x + w / 2)[mask], (y + h / 2)[mask]
+    x0, x1, y0, y1 = x[mask], (x + w)[mask], y[mask], (y + h)[mask]
+    vertical = numpy.stack((numpy.stack((cx, y0), axis=-1), numpy.stack((cx, y1), axis=-1)), axis=1)
+    horizontal = numpy.stack((numpy.stack((x0, cy), axis=-1), numpy.stack((x1, cy), axis=-1)), axis=1)
+    selected = [spec for (_, spec), m in zip(cells, mask) if m] * 2
+    self._lines.set_segments(numpy.concatenate((vertical, horizontal)))
+    self._lines.set_color(self._rgba(
+      to_rgba_array,
+      [spec['color'] or rcParams['lines.color'] for spec in selected],
+      [spec['alpha'] or 0.5 for spec in selected],
+    ))
+
+  def _rgba(self, to_rgba_array, colors, alphas):
+    if not colors:
+      return numpy.zeros((0, 4))
+    rgba = to_rgba_array(colors)
+    rgba[:, 3] = alphas
+    return rgba
+
+  def __len__(self):
+    return len(self._cells)
+
+  def __repr__(self):
+    return f'Annotations(cells={len(self)})'
@@ -1,43 +1,114 @@
 import numpy
-from mpl_toolkits.axes_grid1 import Divider, Size
-from matplotlib.patches import Rectangle
+from . import image
+from .decimation import CHUNKSIZE, Decimation, line_type
 from .spacing import Spacing
-from matplotlib.lines import Line2D
 
 
 class Axes:
 
-	def __init__(self, alignment, width=None, height=None, aspect=None):
+	__slots__ = (
+		'_alignment',
+		'_geometry',
+		'_row',
+		'_col',
+		'_matplotlib',
+		'_child',
+		'text_annotations',
+		'rect_annotations',
+	)
+
+	def __init__(self, alignment, width=None, height=None, aspect=None, index=None):
+
+		# Sizes are stored in the alignment's geometry at the cell's index.
+		if index is None and (width, height, aspect) != (None, None, None):
+			raise ValueError('width, height and aspect require an index')
 
 		self._alignment = alignment
-		self._aspect = aspect or None
-		self._width = width or 0.0
-		self._height = height or 0.0
-		self._spacing = Spacing(0.0, 0.0, 0.0, 0.0)
+		self._geometry = alignment.geometry()
+		self._row = None
+		self._col = None
 		self._matplotlib = None
+		self._child = None
 		self.text_annotations = None
 		self.rect_annotations = None
-		self.line_annotations = None
+
+		if index is not None:
+			self.set_index(*index)
+			g = self._geometry
+			if aspect:
+				g.aspect[index] = aspect
+			if width:
+				g.width[index] = width
+			if height:
+				g.height[index] = height
 
 	def set_alignment(self, alignment):
 		self._alignment = alignment
+		self._geometry = alignment.geometry()
 
 	def alignment(self):
 		return self._alignment
 
+	def geometry(self):
+		return self._geometry
+
+	def child(self):
+		return self._child
+
+	def nest(self, nrows, ncols, **kwargs):
+		child = type(self._alignment)(nrows, ncols, layout_only=True, **kwargs)
+		self.set_child(child)
+		return child
+
+	def set_child(self, child):
+
+		# The cell becomes a container sized by the child alignment, which
+		# draws into the same figure.
+		previous = self._child
+		if previous is not None:
+			previous.remove_axes()
+			previous.set_host(None)
+			previous.close()
+		self._child = child
+		if child is None:
+			self.update()
+			return
+		if self._matplotlib is not None:
+			self.clear_annotations()
+			self._matplotlib.remove()
+			self._matplotlib = None
+		child.set_host(self)
+		fig = self._alignment.figure()
+		if fig is not None:
+			child.attach(fig)
+		else:
+			child.update()
+
+	def set_index(self, row, col):
+		self._row = row
+		self._col = col
+
 	def index(self):
-		index = numpy.where(self.alignment().array() == self)
-		return index
+		return self._row, self._col
+
+	def row(self):
+		return self._row
+
+	def col(self):
+		return self._col
 
 	def set_aspect(self, aspect):
-		self._aspect = aspect
-		self.alignment().update()
+		self._geometry.aspect[self._row, self._col] = aspect or numpy.nan
+		self.update()
 
 	def aspect(self):
-		return self._aspect
+		aspect = float(self._geometry.aspect[self._row, self._col])
+		if aspect != aspect:
+			return None
+		return aspect
 
 	def check_broken_axes(self):
-		ax = self.matplotlib()
+		ax = self._matplotlib
 		if ax is not None:
 			if hasattr(ax, '_broken_axes'):
 				spine = ax._broken_axes_spine
@@ -47,27 +118,31 @@ class Axes:
 				ax.break_spine(spine, aspect=aspect, color=color, d=d)
 
 	def set_width(self, width):
-		self._width = width
-		if self.aspect():
-			self._height = width / self.aspect()
+		g, index = self._geometry, (self._row, self._col)
+		g.width[index] = width
+		aspect = self.aspect()
+		if aspect:
+			g.height[index] = width / aspect
+		self.update()
 		self.check_broken_axes()
-		self.alignment().update()
 
 	def width(self):
-		return self._width
+		return float(self._geometry.width[self._row, self._col])
 
 	def total_width(self):
 		return self.left() + self.width() + self.right()
 
 	def set_height(self, height):
-		self._height = height
-		if self.aspect():
-			self._width = height * self.aspect()
+		g, index = self._geometry, (self._row, self._col)
+		g.height[index] = height
+		aspect = self.aspect()
+		if aspect:
+			g.width[index] = height * aspect
+		self.update()
 		self.check_broken_axes()
-		self.alignment().update()
 
 	def height(self):
-		return self._height
+		return float(self._geometry.height[self._row, self._col])
 
 	def spacing_width(self):
 		return self.left() + self.right()
@@ -79,60 +154,66 @@ class Axes:
 		return self.top() + self.height() + self.bottom()
 
 	def set_size(self, width=None, height=None):
-		if width is not None:
-			self.set_width(width)
-		if height is not None:
-			self.set_height(height)
+		with self.alignment().batch():
+			if width is not None:
+				self.set_width(width)
+			if height is not None:
+				self.set_height(height)
 
 	def total_size(self):
 		return self.total_width(), self.total_height()
 
 	def set_spacing(self, left=None, right=None, top=None, bottom=None, every=None):
-		if every is not None:
-			self._spacing = Spacing(every, every, every, every)
-		if left is not None:
-			self.set_left(left)
-		if right is not None:
-			self.set_right(right)
-		if top is not None:
-			self.set_top(top)
-		if bottom is not None:
-			self.set_bottom(bottom)
-		self.alignment().update()
+		with self.alignment().batch():
+			if every is not None:
+				g, index = self._geometry, (self._row, self._col)
+				g.left[index] = g.right[index] = g.top[index] = g.bottom[index] = every
+			if left is not None:
+				self.set_left(left)
+			if right is not None:
+				self.set_right(right)
+			if top is not None:
+				self.set_top(top)
+			if bottom is not None:
+				self.set_bottom(bottom)
+			self.update()
 
 	def spacing(self):
-		return self._spacing
+		return Spacing(geometry=self._geometry, index=self.index())
 
 	def set_left(self, left):
-		self.spacing().set_left(left)
-		self.alignment().update()
+		self._geometry.left[self._row, self._col] = left
+		self.update()
 
 	def left(self):
-		return self.spacing().left()
+		return float(self._geometry.left[self._row, self._col])
 
 	def set_right(self, right):
-		self.spacing().set_right(right)
-		self.alignment().update()
+		self._geometry.right[self._row, self._col] = right
+		self.update()
 
 	def right(self):
-		return self.spacing().right()
+		return float(self._geometry.right[self._row, self._col])
 
 	def set_bottom(self, bottom):
-		self.spacing().set_bottom(bottom)
-		self.alignment().update()
+		self._geometry.bottom[self._row, self._col] = bottom
+		self.update()
 
 	def bottom(self):
-		return self.spacing().bottom()
+		return float(self._geometry.bottom[self._row, self._col])
 
 	def set_top(self, top):
-		self.spacing().set_top(top)
-		self.alignment().update()
+		self._geometry.top[self._row, self._col] = top
+		self.update()
 
 	def top(self):
-		return self.spacing().top()
+		return float(self._geometry.top[self._row, self._col])
 
 	def matplotlib(self):
-		if self.width() and self.height():
+		if self._child is not None:
+			self._child.place()
+			return None
+		if self.width() and self.height() and self.alignment().figure() is not None:
 			self._matplotlib = self._convert_to_matplotlib()
 		if self._matplotlib is not None:
 			self._matplotlib.get_width = self.width
@@ -143,64 +224,38 @@ class Axes:
 
 		# Verify figure size.
 		a = self.alignment()
-		a_size = a.figure_size()
+		a.resize_figure()
 		f = a.figure()
-		f_size = f.get_size_inches()
-		f_size = (f_size[0], f_size[1])
-		if f_size != a_size:
-			print(f'Resizing figure: ({a_size[0]:.2f}, {a_size[1]:.2f})')
-			f.set_size_inches(a_size)
+		ins = a.instrumentation()
 
 		# Index.
-		index = self.index()
-		row = int(index[0])
-		col = int(index[1])
-
-		# Calculate left.
-		left = 0.0
-		for c in a.array()[row][:col]:
-			left += c.total_width()
-		left += self.left()
-		width = self.width()
-
-		# Calculate bottom.
-		bottom = 0.0
-		for r in a.array()[row + 1:][::1]:
-			row_h = 0.0
-			for c in r:
-				h = c.total_height()
-				if h > row_h: 
-					row_h = h
-			bottom += row_h
-		bottom += self.bottom()
-		height = self.height()
-		
-		# Create ax. 
+		row, col = self.index()
+
+		# Position in figure fractions, solved once per layout.
+		position = tuple(a.fractions()[row, col])
+
+		# Create ax.
 		if self._matplotlib is None:
-			h = [Size.Fixed(left), Size.Fixed(width)]
-			v = [Size.Fixed(bottom), Size.Fixed(height)]
-			divider = Divider(f, (0, 0, 1, 1), h, v, aspect=False)
-			ax = f.add_axes(
-				divider.get_position(), 
-				axes_locator=divider.new_locator(nx=1, ny=1)
-			)
+			ax = f.add_axes(position)
+			if ins is not None:
+				ins.count('axes_created')
 		else:
 			ax = self._matplotlib
-			h = [Size.Fixed(left), Size.Fixed(width)]
-			v = [Size.Fixed(bottom), Size.Fixed(height)]
-			divider = Divider(f, (0, 0, 1, 1), h, v, aspect=False)
-			ax.set_position(divider.get_position())
-			ax.set_axes_locator(divider.new_locator(nx=1, ny=1))
+			ax.set_position(position)
+			if not ax.get_visible():
+				ax.set_visible(True)
+			if ins is not None:
+				ins.count('axes_repositioned')
 
 		if self.text_annotations:
 			self.annotate_text()
 
-		if self.rect_annotations:
-			self.annotate_rect()
-
 		return ax
 
 	def annotate(self):
+		if self._child is not None:
+			self._child.annotate()
+			return
 		self.annotate_text()
 		self.annotate_rect()
 
@@ -286,6 +341,7 @@ class Axes:
 				texts.append(tb)
 
 			self.text_annotations = texts
+			self._count('artists_created', len(texts))
 
 	def clear_text_annotations(self):
 
@@ -293,24 +349,18 @@ class Axes:
 		if ax and self.text_annotations:
 			for text in self.text_annotations:
 				if text in ax.texts:
-					ax.texts.remove(text)
+					text.remove()
+					self._count('artists_removed')
 			self.text_annotations = None
 
 	def clear_rect_annotations(self):
 
-		ax = self._matplotlib
-		if ax and self.rect_annotations:
-			for patch in self.rect_annotations:
-				if patch in ax.patches:
-					ax.patches.remove(patch)
+		if self.rect_annotations:
+			annotations = self.alignment().annotations()
+			if annotations is not None:
+				annotations.remove(self)
 			self.rect_annotations = None
 
-		if ax and self.line_annotations:
-			for line in self.line_annotations:
-				if line in ax._children:
-					ax._children.remove(line)
-			self.line_annotations = None
-
 	def clear_annotations(self):
 		self.clear_text_annotations()
 		self.clear_rect_annotations()
@@ -326,107 +376,120 @@ class Axes:
 			else:
 				every = True
 
-			self.clear_rect_annotations()
-
-			if every or center:
-				lines = []
-				line1 = ax.add_artist(Line2D(
-					[0.5, 0.5],
-					[0.0, 1.0],
-					transform=ax.transAxes,
-					color=color or None,
-					alpha=alpha or 0.5,
-				))
-				lines.append(line1)
-				line2 = ax.add_artist(Line2D(
-					[0.0, 1.0],
-					[0.5, 0.5],
-					transform=ax.transAxes,
-					color=color or None,
-					alpha=alpha or 0.5)
-				)
-				lines.append(line2)
-				self.line_annotations = lines
-
-			patches = []
-
-			if (every or left) and (self.width() and self.height()):
-				width = self.left()/self.width()
-				height = self.height()/self.height()
-				x = 0.0 - width
-				y = 0.0
-				rect = Rectangle(
-					(x, y),
-					width=width,
-					height=height,
-					color=color or '#F16A70',
-					alpha=alpha or 0.95,
-					transform=ax.transAxes,
-					clip_on=False,
-					linewidth=0.0,
-					zorder=-5,
-				)
-				patch = ax.add_patch(rect)
-				patches.append(patch)
+			self.rect_annotations = dict(
+				center=every or center,
+				left=every or left,
+				right=every or right,
+				top=every or top,
+				bottom=every or bottom,
+				color=color,
+				alpha=alpha,
+			)
+			self.alignment().annotations(create=True).add(self, self.rect_annotations)
 
-			if (every or right) and (self.width() and self.height()):
-				width = self.right()/self.width()
-				height = self.height()/self.height()
-				x = 1.0
-				y = 0.0
-				rect = Rectangle(
-					(x, y),
-					width=width,
-					height=height,
-					color=color or '#B1D877',
-					alpha=alpha or 0.95,
-					transform=ax.transAxes,
-					clip_on=False,
-					linewidth=0.0,
-					zorder=-5,
-				)
-				patch = ax.add_patch(rect)
-				patches.append(patch)
+	def plot_decimated(self, *args, chunksize=CHUNKSIZE, **kwargs):
 
-			if (every or top) and (self.width() and self.height()):
-				width = self.width()/self.width()
-				height = self.top()/self.height()
-				x = 0.0
-				y = 1.0
-				rect = Rectangle(
-					(x, y),
-					width=width,
-					height=height,
-					color=color or '#8CDCDA',
-					alpha=alpha or 0.95,
-					transform=ax.transAxes,
-					clip_on=False,
-					linewidth=0.0,
-					zorder=-5,
-				)
-				patch = ax.add_patch(rect)
-				patches.append(patch)
+		ax = self.matplotlib()
+		if ax is None:
+			return None
 
-			if (every or bottom) and (self.width() and self.height()):
-				width = self.width()/self.width()
-				height = self.bottom()/self.height()
-				x = 0.0
-				y = 0.0 - height
-				rect = Rectangle(
-					(x, y),
-					width=width,
-					height=height,
-					color=color or '#4D4D4D',
-					alpha=alpha or 0.95,
-					transform=ax.transAxes,
-					clip_on=False,
-					linewidth=0.0,
-					zorder=-5,
-				)
-				patch = ax.add_patch(rect)
-				patches.append(patch)
+		# plot_decimated(y) or plot_decimated(x, y, fmt). x must be sorted.
+		if len(args) == 1 or isinstance(args[1], str):
+			x, y, args = None, args[0], args[1:]
+		else:
+			x, y, args = args[0], args[1], args[2:]
+
+		# Memory-mapped arrays are ndarrays and stay unloaded; lists are not.
+		if not isinstance(y, numpy.ndarray):
+			y = numpy.asarray(y)
+		if x is not None and not isinstance(x, numpy.ndarray):
+			x = numpy.asarray(x)
+		if x is not None and len(x) != len(y):
+			raise ValueError(f'x and y must have the same length, got {len(x)} and {len(y)}')
+
+		# Decimate over the whole series at the figure DPI so that autoscaling
+		# sees the true extremes; the line refines itself for the view on draw.
+		decimation = Decimation(self, x, y, chunksize=chunksize)
+		start, stop = decimation.data_limits()
+
+		# The line is built as a DecimatedLine2D. An empty plot resolves the
+		# format string and the next color of the cycle, and requests the
+		# autoscaling that plot would.
+		template, = ax.plot([], [], *args, **kwargs)
+		template.remove()
+		line = line_type()(*decimation.decimate(start, stop, decimation.columns()), **kwargs)
+		line.update_from(template)
+		ax.add_line(line)
+		decimation.set_line(line)
+		return line
+
+	def show_image(self, array, extent=None, method='mean', chunksize=image.CHUNKSIZE, cache=None, **kwargs):
 
-			self.rect_annotations = patches
+		ax = self.matplotlib()
+		if ax is None:
+			return None
+
+		# Keep the extent of the full array, and keep the axes at their exact size.
+		nrows, ncols = array.shape[:2]
+		if extent is None:
+			if kwargs.get('origin', 'upper') == 'upper':
+				extent = (-0.5, ncols - 0.5, nrows - 0.5, -0.5)
+			else:
+				extent = (-0.5, ncols - 0.5, -0.5, nrows - 0.5)
+		aspect = kwargs.pop('aspect', 'auto')
+		alpha, vmin, vmax, url = (kwargs.pop(name, None) for name in ('alpha', 'vmin', 'vmax', 'url'))
+		kwargs.setdefault('interpolation', 'nearest')
+
+		# Resample for the whole axes at the figure DPI; the image resamples
+		# again on draw if the extent covers a different number of pixels.
+		resampling = image.Resampling(self, array, extent, method=method, chunksize=chunksize, cache=cache)
+		dpi = self.alignment().figure().dpi
+		shape = (max(1, int(round(self.height() * dpi))), max(1, int(round(self.width() * dpi))))
+
+		# Built as a ResampledImage the way imshow builds its AxesImage.
+		result = image.image_type()(ax, extent=extent, **kwargs)
+		ax.set_aspect(aspect)
+		result.set_data(resampling.resample(shape))
+		result.set_alpha(alpha)
+		if result.get_clip_path() is None:
+			result.set_clip_path(ax.patch)
+		result.set_clim(vmin, vmax)
+		result.autoscale_None()
+		result.set_url(url)
+		result.set_extent(result.get_extent())
+		ax.add_image(result)
+		resampling.set_image(result, shape)
+		return result
+
+	def recycle(self):
+		ax = self._matplotlib
+		if ax is None:
+			return False
+		for artist in [*ax.lines, *ax.images, *ax.texts, *ax.patches, *ax.collections, *ax.tables]:
+			artist.remove()
+		legend = ax.get_legend()
+		if legend is not None:
+			legend.remove()
+		# Containers (e.g. from bar) keep their removed artists alive, and the
+		# property cycle restarts so that renders of a template match.
+		ax.containers.clear()
+		ax.set_prop_cycle(None)
+		ax.set_title('')
+		ax.set_xlabel('')
+		ax.set_ylabel('')
+		ax.relim()
+		ax.set_autoscale_on(True)
+		return True
+
+	def _count(self, name, n=1):
+		ins = self._alignment.instrumentation()
+		if ins is not None:
+			ins.count(name, n)
+
+	def update(self):
+		a = self.alignment()
+		a.mark_dirty(self._row, self._col)
+		return a.update()
 
 	def __repr__(self):
 		return f'Axes(width={self.width()}, height={self.height()}, aspect={self.aspect()}, spacing={self.spacing()}'
@@ -0,0 +1,100 @@
+import hashlib
+import os
+import tempfile
+
+import numpy
+
+from .layout import Layout
+from .util import LRUCache
+
+
+class LayoutCache(LRUCache):
+
+  def __init__(self, maxsize=128, directory=None):
+
+    super().__init__(maxsize)
+    self._directory = directory
+    if directory is not None:
+      os.makedirs(directory, exist_ok=True)
+
+  @staticmethod
+  def key(*arrays):
+    digest = hashlib.sha1()
+    for array in arrays:
+      array = numpy.ascontiguousarray(array, dtype=numpy.float64)
+      digest.update(repr(array.shape).encode())
+      digest.update(array.tobytes())
+    return digest.hexdigest()
+
+  def _find(self, key):
+    layout = self._entries.get(key)
+    if layout is None and self._directory is not None:
+      layout = self._load(key)
+      if layout is not None:
+        self._store(key, layout)
+    return layout
+
+  def put(self, key, layout):
+    self._store(key, layout)
+    if self._directory is not None:
+      self._save(key, layout)
+
+  def solve(self, width, height, left, right, top, bottom, key=None):
+    if key is None:
+      key = self.key(width, height, left, right, top, bottom)
+    layout = self.get(key)
+    if layout is None:
+      layout = Layout(width, height, left, right, top, bottom)
+      self.put(key, layout)
+    return layout
+
+  def _path(self, key):
+    return os.path.join(self._directory, f'{key}.npz')
+
+  def _load(self, key):
+    # Other processes may prune the file at any time; that is a miss.
+    path = self._path(key)
+    try:
+      with numpy.load(path) as data:
+        layout = Layout.solved(data['positions'], *data['figure_size'])
+      os.utime(path)
+    except FileNotFoundError:
+      return None
+    return layout
+
+  def _save(self, key, layout):
+    # Each writer gets its own temporary file, so processes sharing the
+    # directory never write to the same one.
+    fd, tmp = tempfile.mkstemp(dir=self._directory, suffix='.tmp')
+    try:
+      with os.fdopen(fd, 'wb') as f:
+        numpy.savez(f, positions=layout.positions(), figure_size=numpy.array(layout.figure_size()))
+      os.replace(tmp, self._path(key))
+    except BaseException:
+      os.remove(tmp)
+      raise
+    self._prune()
+
+  def _prune(self):
+    # Files that another process removed meanwhile are skipped.
+    entries = []
+    for name in os.listdir(self._directory):
+      if name.endswith('.npz'):
+        path = os.path.join(self._directory, name)
+        try:
+          entries.append((os.path.getmtime(path), path))
+        except FileNotFoundError:
+          pass
+    if len(entries) > self._maxsize:
+      entries.sort()
+      for _, path in entries[:len(entries) - self._maxsize]:
+        try:
+          os.remove(path)
+        except FileNotFoundError:
+          pass
+
+  def __repr__(self):
+    return f'LayoutCache(size={len(self)}, maxsize={self._maxsize}, directory={self._directory!r})'
+
+
+default_cache = LayoutCache()
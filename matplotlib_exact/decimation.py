@@ -0,0 +1,142 @@
+import numpy
+
+from .util import lazy_type
+
+
+CHUNKSIZE = 1 << 22
+
+
+@lazy_type
+def line_type():
+  from matplotlib.lines import Line2D
+
+  class DecimatedLine2D(Line2D):
+
+    def draw(self, renderer):
+      self.decimation.refresh(force=False)
+      super().draw(renderer)
+
+  return DecimatedLine2D
+
+
+def _m4(x, y, start, stop, columns, offset):
+
+  # Device pixel column of every sample, where offset is the fractional pixel
+  # position of start. Samples are sorted by x, so each column is one
+  # contiguous run.
+  bins = numpy.floor((x - start) * (columns / (stop - start)) + offset).astype(numpy.intp)
+  numpy.clip(bins, 0, int(columns + offset), out=bins)
+  starts = numpy.flatnonzero(numpy.diff(bins)) + 1
+  starts = numpy.concatenate(([0], starts))
+  ends = numpy.concatenate((starts[1:], [len(x)])) - 1
+  group = numpy.repeat(numpy.arange(len(starts)), ends - starts + 1)
+
+  # First sample reaching the minimum and maximum of each run. Runs that are
+  # all NaN have no such sample.
+  selected = [starts, ends]
+  for reduce in (numpy.fmin, numpy.fmax):
+    hits = numpy.flatnonzero(y == reduce.reduceat(y, starts)[group])
+    _, first = numpy.unique(group[hits], return_index=True)
+    selected.append(hits[first])
+
+  return numpy.unique(numpy.concatenate(selected))
+
+
+def m4(x, y, start, stop, columns, offset=0.0, chunksize=CHUNKSIZE):
+
+  # Keeps the first, last, minimum and maximum sample of every pixel column
+  # between start and stop, plus the neighbours just outside so lines run to
+  # the edge. columns is the width of that range in pixels. Returns sorted
+  # indices into y.
+  n = len(y)
+  if x is None:
+    lo = min(n, max(0, int(numpy.ceil(start))))
+    hi = min(n, max(0, int(numpy.floor(stop)) + 1))
+  else:
+    lo = int(numpy.searchsorted(x, start, side='left'))
+    hi = int(numpy.searchsorted(x, stop, side='right'))
+
+  if hi - lo <= 4 * (columns + 1) or not stop > start:
+    return numpy.arange(max(lo - 1, 0), min(hi + 1, n), dtype=numpy.intp)
+
+  # Reduce chunk by chunk so memory-mapped inputs are never fully loaded.
+  candidates = []
+  for i in range(lo, hi, chunksize):
+    j = min(i + chunksize, hi)
+    xs = numpy.arange(i, j, dtype=numpy.float64) if x is None else numpy.asarray(x[i:j], dtype=numpy.float64)
+    ys = numpy.asarray(y[i:j], dtype=numpy.float64)
+    candidates.append(_m4(xs, ys, start, stop, columns, offset) + i)
+  indices = numpy.concatenate(candidates)
+
+  # Columns split across chunks hold up to eight candidates; reduce once more.
+  if len(candidates) > 1:
+    xs = indices.astype(numpy.float64) if x is None else numpy.asarray(x[indices], dtype=numpy.float64)
+    ys = numpy.asarray(y[indices], dtype=numpy.float64)
+    indices = indices[_m4(xs, ys, start, stop, columns, offset)]
+
+  outside = [i for i in (lo - 1, hi) if 0 <= i < n]
+  return numpy.unique(numpy.concatenate((indices, outside))).astype(numpy.intp)
+
+
+class Decimation:
+
+  def __init__(self, axes, x, y, chunksize=CHUNKSIZE):
+
+    self._axes = axes
+    self._x = x
+    self._y = y
+    self._chunksize = chunksize
+    self._line = None
+    self._key = None
+
+  def line(self):
+    return self._line
+
+  def set_line(self, line):
+    line.decimation = self
+    self._line = line
+
+  def data_limits(self):
+    if self._x is None:
+      return 0.0, float(len(self._y) - 1)
+    return float(self._x[0]), float(self._x[-1])
+
+  def columns(self, dpi=None):
+    if dpi is None:
+      dpi = self._axes.alignment().figure().dpi
+    return self._axes.width() * dpi
+
+  def decimate(self, start, stop, columns, offset=0.0):
+    indices = m4(self._x, self._y, start, stop, columns, offset=offset, chunksize=self._chunksize)
+    x = indices if self._x is None else numpy.asarray(self._x[indices])
+    return x, numpy.asarray(self._y[indices])
+
+  def refresh(self, force=True):
+
+    line = self._line
+    ax = line.axes
+    if ax is None:
+      return
+
+    # Pixel columns are only evenly spaced in data on a linear scale.
+    if ax.get_xscale() != 'linear':
+      if self._key != 'full':
+        self._key = 'full'
+        line.set_data(numpy.arange(len(self._y)) if self._x is None else self._x, self._y)
+      return
+
+    # The axes bounding box is in device pixels at the current (possibly
+    # savefig) DPI, so this is the number of pixel columns actually drawn.
+    start, stop = sorted(ax.get_xlim())
+    x0, x1 = ax.bbox.intervalx
+    key = (x1 - x0, x0 % 1.0, start, stop)
+    if not force and key == self._key:
+      return
+    self._key = key
+    line.set_data(*self.decimate(start, stop, x1 - x0, x0 % 1.0))
+
+  def __len__(self):
+    return len(self._y)
+
+  def __repr__(self):
+    return f'Decimation(points={len(self)}, shown={0 if self._line is None else len(self._line.get_xdata())})'
@@ -0,0 +1,65 @@
+import numpy
+
+
+def fit_sizes(geometry, figure_width, figure_height, fixed, weights, aspect, tolerance=1e-9):
+
+  # Every free cell in row r gets the content height c[r] = rho[r] * t, and
+  # its width from the row's share u[r] * weight of what the spacings, fixed
+  # cells and aspect-bound cells leave of the figure width. Cells with an
+  # aspect take their width from c[r] instead. The row height is the larger
+  # of c[r] plus the largest free cell spacing and its tallest fixed cell.
+  g = geometry
+  shape = g.shape()
+  fixed = numpy.broadcast_to(numpy.asarray(fixed, dtype=bool), shape)
+  weights = numpy.broadcast_to(numpy.asarray(weights, dtype=float), shape)
+  aspect = numpy.broadcast_to(numpy.asarray(aspect, dtype=float), shape)
+  if numpy.any(weights < 0) or not numpy.all(numpy.isfinite(weights)):
+    raise ValueError('weights must be finite and non-negative')
+
+  free = ~fixed
+  bound = free & ~numpy.isnan(aspect) & (aspect > 0)
+  stretch = free & ~bound
+  spacing_height = g.top + g.bottom
+
+  # Heights: solve for t, moving rows whose fixed cells are taller than their
+  # free cells to the constant rows until the set no longer changes.
+  rho = numpy.where(free, weights, 0.0).max(axis=1, initial=0.0)
+  s = numpy.where(free, spacing_height, -numpy.inf).max(axis=1, initial=-numpy.inf)
+  d = numpy.where(fixed, spacing_height + g.height, -numpy.inf).max(axis=1, initial=-numpy.inf)
+  constant = rho == 0
+  while True:
+    variable = ~constant
+    rest = figure_height - numpy.where(constant, numpy.maximum(d, s), s).sum()
+    total = rho[variable].sum()
+    if total == 0:
+      if abs(rest) > tolerance:
+        raise ValueError(f'Cannot fit figure height {figure_height:g}: rows add up to {figure_height - rest:g} and have no free height')
+      t = 0.0
+      break
+    t = rest / total
+    if t < 0:
+      raise ValueError(f'Cannot fit figure height {figure_height:g}: spacings and fixed cells need {figure_height - rest:g}')
+    dominated = variable & (rho * t + s < d)
+    if not dominated.any():
+      break
+    constant |= dominated
+
+  height = numpy.where(free, (rho * t)[:, numpy.newaxis], g.height)
+
+  # Widths: one share per row.
+  bound_width = numpy.where(bound, height * numpy.where(bound, aspect, 1.0), 0.0)
+  known = (g.left + g.right).sum(axis=1) + numpy.where(fixed, g.width, 0.0).sum(axis=1) + bound_width.sum(axis=1)
+  share = numpy.where(stretch, weights, 0.0).sum(axis=1)
+  stretchable = share > 0
+  if numpy.any(known[~stretchable] > figure_width + tolerance):
+    rows = numpy.flatnonzero(~stretchable & (known > figure_width + tolerance)).tolist()
+    raise ValueError(f'Cannot fit figure width {figure_width:g}: rows {rows} are wider and cannot shrink')
+  if not stretchable.any() and abs(known.max(initial=0.0) - figure_width) > tolerance:
+    raise ValueError(f'Cannot fit figure width {figure_width:g}: no row can stretch and the widest is {known.max(initial=0.0):g}')
+  u = numpy.divide(figure_width - known, share, out=numpy.zeros_like(share), where=stretchable)
+  if numpy.any(u < 0):
+    rows = numpy.flatnonzero(u < 0).tolist()
+    raise ValueError(f'Cannot fit figure width {figure_width:g}: spacings and fixed cells of rows {rows} are wider')
+  width = numpy.where(stretch, u[:, numpy.newaxis] * weights, numpy.where(bound, bound_width, g.width))
+
+  return width, height
@@ -0,0 +1,64 @@
+import numpy
+
+
+def reserve(buffer, nrows, ncols, fill):
+  # Grows a 2d buffer to hold at least (nrows, ncols), doubling each dimension
+  # that is too small, so that growing a grid costs amortized O(1) per cell.
+  rows, cols = buffer.shape
+  if nrows <= rows and ncols <= cols:
+    return buffer
+  shape = (max(nrows, 2 * rows) if nrows > rows else rows, max(ncols, 2 * cols) if ncols > cols else cols)
+  grown = numpy.full(shape, fill, dtype=buffer.dtype)
+  grown[:rows, :cols] = buffer
+  return grown
+
+
+class Geometry:
+
+  __slots__ = ('width', 'height', 'left', 'right', 'top', 'bottom', 'aspect', '_buffers')
+
+  fields = ('width', 'height', 'left', 'right', 'top', 'bottom', 'aspect')
+  defaults = dict(width=0.0, height=0.0, left=0.0, right=0.0, top=0.0, bottom=0.0, aspect=numpy.nan)
+
+  def __init__(self, nrows, ncols):
+    # Every field is a view of the top left corner of a larger buffer, whose
+    # remaining entries always hold the field default.
+    self._buffers = {}
+    for name in self.fields:
+      self._buffers[name] = self._empty(name, (nrows, ncols))
+      setattr(self, name, self._buffers[name])
+
+  def _empty(self, name, shape):
+    return numpy.full(shape, self.defaults[name], dtype=numpy.float64)
+
+  def clear(self):
+    for name in self.fields:
+      getattr(self, name).fill(self.defaults[name])
+
+  def shape(self):
+    return self.width.shape
+
+  def capacity(self):
+    return self._buffers['width'].shape
+
+  def reshape(self, nrows, ncols):
+    for name in self.fields:
+      self._buffers[name] = numpy.reshape(getattr(self, name), (nrows, ncols))
+      setattr(self, name, self._buffers[name])
+
+  def resize(self, nrows, ncols):
+    rows, cols = self.shape()
+    if nrows < rows or ncols < cols:
+      raise ValueError(f'Geometry can only grow, got {(nrows, ncols)} for shape {(rows, cols)}')
+    for name in self.fields:
+      self._buffers[name] = reserve(self._buffers[name], nrows, ncols, self.defaults[name])
+      setattr(self, name, self._buffers[name][:nrows, :ncols])
+
+  def total_width(self):
+    return self.left + self.width + self.right
+
+  def total_height(self):
+    return self.top + self.height + self.bottom
+
+  def __repr__(self):
+    return f'Geometry(shape={self.shape()})'
@@ -0,0 +1,167 @@
+import weakref
+
+import numpy
+
+from .util import LRUCache, lazy_type
+
+
+CHUNKSIZE = 1 << 24
+METHODS = ('mean', 'stride')
+
+
+@lazy_type
+def image_type():
+  from matplotlib.image import AxesImage
+
+  class ResampledImage(AxesImage):
+
+    def draw(self, renderer, *args, **kwargs):
+      self.resampling.refresh(force=False)
+      super().draw(renderer, *args, **kwargs)
+
+  return ResampledImage
+
+
+def _edges(n, m):
+  # Start of each of m nearly equal blocks covering n samples.
+  return numpy.arange(m + 1) * n // m
+
+
+def _asarray(array):
+  # Keeps the mask of masked arrays, and loads memory-mapped ones.
+  if numpy.ma.isMaskedArray(array):
+    return array
+  return numpy.asarray(array)
+
+
+def resample(array, shape, method='mean', chunksize=CHUNKSIZE):
+
+  if method not in METHODS:
+    raise ValueError(f'method must be one of {METHODS}, got {method!r}')
+
+  # Never upsample; matplotlib does that without touching the data.
+  nrows, ncols = array.shape[:2]
+  rows, cols = min(nrows, int(shape[0])), min(ncols, int(shape[1]))
+  if (rows, cols) == (nrows, ncols):
+    return _asarray(array)
+  row_edges, col_edges = _edges(nrows, rows), _edges(ncols, cols)
+
+  # Center sample of each block. Indexing rows first only reads those rows of
+  # a memory-mapped array.
+  if method == 'stride':
+    r = (row_edges[:-1] + row_edges[1:]) // 2
+    c = (col_edges[:-1] + col_edges[1:]) // 2
+    return _asarray(array[r])[:, c]
+
+  # Block mean, reading whole blocks of rows at a time so that at most about
+  # chunksize samples are loaded. Masked and NaN samples are left out of the
+  # mean; blocks without a valid sample are NaN.
+  masked = numpy.ma.isMaskedArray(array)
+  out = numpy.empty((rows, cols) + array.shape[2:], dtype=numpy.float64)
+  widths = numpy.diff(col_edges).reshape((1, cols) + (1,) * (array.ndim - 2))
+  step = max(1, chunksize // max(1, (nrows // rows) * array[0].size))
+  for i in range(0, rows, step):
+    j = min(i + step, rows)
+    start, stop = row_edges[i], row_edges[j]
+    chunk = array[start:stop]
+    invalid = numpy.ma.getmaskarray(chunk) if masked else None
+    chunk = numpy.asarray(numpy.ma.getdata(chunk), dtype=numpy.float64)
+    nan = numpy.isnan(chunk)
+    if nan.any():
+      invalid = nan if invalid is None else invalid | nan
+    heights = numpy.diff(row_edges[i:j + 1]).reshape((j - i, 1) + (1,) * (array.ndim - 2))
+    if invalid is None or not invalid.any():
+      counts = heights * widths
+    else:
+      chunk = numpy.where(invalid, 0.0, chunk)
+      counts = numpy.add.reduceat(numpy.add.reduceat(~invalid, row_edges[i:j] - start, axis=0, dtype=numpy.intp), col_edges[:-1], axis=1)
+    sums = numpy.add.reduceat(numpy.add.reduceat(chunk, row_edges[i:j] - start, axis=0), col_edges[:-1], axis=1)
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+      out[i:j] = sums / counts
+
+  # Keep integer images (e.g. uint8 RGB) in their value range, and mask empty
+  # blocks of masked arrays.
+  empty = numpy.isnan(out)
+  if numpy.issubdtype(array.dtype, numpy.integer):
+    out = numpy.rint(numpy.where(empty, 0.0, out)).astype(array.dtype)
+  if masked:
+    return numpy.ma.masked_array(out, mask=empty)
+  return out
+
+
+class ImageCache(LRUCache):
+
+  def __init__(self, maxsize=16):
+    super().__init__(maxsize)
+
+  @staticmethod
+  def key(array, extent, shape, method):
+    return (id(array), array.shape, str(array.dtype), tuple(extent), tuple(shape), method)
+
+  def _find(self, key, array):
+    entry = self._entries.get(key)
+    # Identity is checked through a weak reference since ids are reused.
+    if entry is None or entry[0]() is not array:
+      return None
+    return entry[1]
+
+  def put(self, key, array, data):
+    self._store(key, (weakref.ref(array), data))
+
+  def resample(self, array, extent, shape, method='mean', chunksize=CHUNKSIZE):
+    key = self.key(array, extent, shape, method)
+    data = self.get(key, array)
+    if data is None:
+      data = resample(array, shape, method=method, chunksize=chunksize)
+      self.put(key, array, data)
+    return data
+
+
+default_image_cache = ImageCache()
+
+
+class Resampling:
+
+  def __init__(self, axes, array, extent, method='mean', chunksize=CHUNKSIZE, cache=None):
+
+    self._axes = axes
+    self._array = array
+    self._extent = tuple(float(e) for e in extent)
+    self._method = method
+    self._chunksize = chunksize
+    self._cache = default_image_cache if cache is None else cache
+    self._image = None
+    self._shape = None
+
+  def image(self):
+    return self._image
+
+  def set_image(self, image, shape):
+    image.resampling = self
+    self._image = image
+    self._shape = shape
+
+  def shape(self):
+    return self._shape
+
+  def resample(self, shape):
+    return self._cache.resample(self._array, self._extent, shape, method=self._method, chunksize=self._chunksize)
+
+  def refresh(self, force=True):
+
+    image = self._image
+    ax = image.axes
+    if ax is None:
+      return
+
+    # Device pixels covered by the extent at the current (possibly savefig) DPI.
+    left, right, bottom, top = self._extent
+    (x0, y0), (x1, y1) = ax.transData.transform([(left, bottom), (right, top)])
+    shape = (max(1, int(round(abs(y1 - y0)))), max(1, int(round(abs(x1 - x0)))))
+    if not force and shape == self._shape:
+      return
+    self._shape = shape
+    image.set_data(self.resample(shape))
+
+  def __repr__(self):
+    return f'Resampling(source={self._array.shape[:2]}, shape={self._shape}, method={self._method!r})'
@@ -0,0 +1,75 @@
+import contextlib
+import time
+
+
+class Instrumentation:
+
+  counters = (
+    'updates',
+    'layouts',
+    'axes_created',
+    'axes_repositioned',
+    'figure_resizes',
+    'artists_created',
+    'artists_removed',
+  )
+
+  def __init__(self, hook=None, profiler=None):
+
+    self._counts = dict.fromkeys(self.counters, 0)
+    self._timings = {}
+    self._hooks = []
+    self._profiler = profiler
+    self._depth = 0
+    if hook is not None:
+      self.add_hook(hook)
+
+  def add_hook(self, hook):
+    self._hooks.append(hook)
+
+  def remove_hook(self, hook):
+    self._hooks.remove(hook)
+
+  def set_profiler(self, profiler):
+    self._profiler = profiler
+
+  def profiler(self):
+    return self._profiler
+
+  def count(self, name, n=1):
+    self._counts[name] = self._counts.get(name, 0) + n
+
+  def counts(self):
+    return dict(self._counts)
+
+  def timings(self):
+    return dict(self._timings)
+
+  def stats(self):
+    return dict(counts=self.counts(), timings=self.timings())
+
+  def reset(self):
+    self._counts = dict.fromkeys(self.counters, 0)
+    self._timings = {}
+
+  @contextlib.contextmanager
+  def trace(self, name):
+    # Profilers only run for the outermost traced section.
+    profiler = self._profiler if self._depth == 0 else None
+    self._depth += 1
+    if profiler is not None:
+      profiler.enable()
+    start = time.perf_counter()
+    try:
+      yield self
+    finally:
+      elapsed = time.perf_counter() - start
+      if profiler is not None:
+        profiler.disable()
+      self._depth -= 1
+      self._timings[name] = self._timings.get(name, 0.0) + elapsed
+      for hook in self._hooks:
+        hook(name, elapsed)
+
+  def __repr__(self):
+    return f'Instrumentation(counts={self.counts()})'
@@ -0,0 +1,81 @@
+import numpy
+
+
+class Layout:
+
+  def __init__(self, width, height, left, right, top, bottom):
+
+    width = numpy.asarray(width, dtype=float)
+    height = numpy.asarray(height, dtype=float)
+    left = numpy.asarray(left, dtype=float)
+    right = numpy.asarray(right, dtype=float)
+    top = numpy.asarray(top, dtype=float)
+    bottom = numpy.asarray(bottom, dtype=float)
+
+    total_width = left + width + right
+    total_height = top + height + bottom
+
+    # Figure width is the widest running row sum, figure height the sum of row maxima.
+    right_edges = numpy.cumsum(total_width, axis=1)
+    row_heights = numpy.maximum(total_height.max(axis=1, initial=0.0), 0.0)
+    self._figure_width = float(max(right_edges.max(initial=0.0), 0.0))
+    self._figure_height = float(row_heights.sum())
+
+    # Offsets of every cell from the bottom left corner of the figure.
+    x = right_edges - total_width + left
+    below = numpy.cumsum(row_heights[::-1])[::-1] - row_heights
+    y = below[:, numpy.newaxis] + bottom
+
+    self._positions = numpy.stack((x, y, width, height), axis=-1)
+    self._fractions = None
+    self._error = None
+
+  @classmethod
+  def solved(cls, positions, figure_width, figure_height):
+    layout = cls.__new__(cls)
+    layout._positions = numpy.asarray(positions, dtype=float)
+    layout._figure_width = float(figure_width)
+    layout._figure_height = float(figure_height)
+    layout._fractions = None
+    layout._error = None
+    return layout
+
+  def snapped(self, dpi):
+
+    # Round every edge, not every width, to the nearest device pixel so that
+    # no edge moves by more than half a pixel however many cells precede it.
+    x, y, w, h = numpy.moveaxis(self._positions, -1, 0)
+    edges = numpy.rint(numpy.stack((x, y, x + w, y + h), axis=-1) * dpi)
+    x0, y0, x1, y1 = numpy.moveaxis(edges, -1, 0)
+    positions = numpy.stack((x0, y0, x1 - x0, y1 - y0), axis=-1) / dpi
+    width, height = (numpy.rint(numpy.array(self.figure_size()) * dpi) / dpi).tolist()
+    layout = self.solved(positions, width, height)
+    layout._error = positions - self._positions
+    return layout
+
+  def positions(self):
+    return self._positions
+
+  def fractions(self):
+    if self._fractions is None:
+      size = numpy.array(self.figure_size() * 2)
+      scale = numpy.divide(1.0, size, out=numpy.zeros_like(size), where=size > 0)
+      self._fractions = self._positions * scale
+    return self._fractions
+
+  def rounding_error(self):
+    if self._error is None:
+      return numpy.zeros_like(self._positions)
+    return self._error
+
+  def figure_width(self):
+    return self._figure_width
+
+  def figure_height(self):
+    return self._figure_height
+
+  def figure_size(self):
+    return self.figure_width(), self.figure_height()
+
+  def __repr__(self):
+    return f'Layout(figure_size={self.figure_size()}, shape={self.positions().shape[:2]})'
@@ -0,0 +1,123 @@
+import concurrent.futures
+import io
+import os
+import traceback
+
+from .alignment import Alignment
+
+
+class Job:
+
+  def __init__(self, spec, plot=None, path=None, format=None, **savefig):
+
+    self.spec = spec
+    self.plot = plot
+    self.path = path
+    self.format = format
+    self.savefig = savefig
+
+  def __repr__(self):
+    return f'Job(path={self.path!r}, format={self.format!r})'
+
+
+class Result:
+
+  def __init__(self, index, path=None, data=None, error=None):
+
+    self.index = index
+    self.path = path
+    self.data = data
+    self.error = error
+
+  def ok(self):
+    return self.error is None
+
+  def __repr__(self):
+    status = 'ok' if self.ok() else 'error'
+    return f'Result(index={self.index}, path={self.path!r}, {status})'
+
+
+def render(job, index=0):
+  alignment = None
+  try:
+    if isinstance(job.spec, str):
+      alignment = Alignment.from_json(job.spec, pyplot=False)
+    else:
+      alignment = Alignment.from_spec(job.spec, pyplot=False)
+    if job.plot is not None:
+      job.plot(alignment)
+    fig = alignment.figure()
+    if job.path is not None:
+      fig.savefig(job.path, format=job.format, **job.savefig)
+      return Result(index, path=job.path)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=job.format or 'png', **job.savefig)
+    return Result(index, data=buffer.getvalue())
+  except Exception:
+    return Result(index, path=job.path, error=traceback.format_exc())
+  finally:
+    if alignment is not None:
+      alignment.close()
+
+
+def _initialize():
+  import matplotlib
+  matplotlib.use('Agg')
+
+
+def render_many(jobs, workers=None, ordered=False, max_pending=None):
+
+  jobs = [job if isinstance(job, Job) else Job(**job) for job in jobs]
+
+  # Render inline without a pool.
+  # Figures are built without pyplot, so rendering in the calling process
+  # leaves its backend alone.
+  if workers == 0:
+    for index, job in enumerate(jobs):
+      yield render(job, index)
+    return
+
+  workers = workers or os.cpu_count() or 1
+  max_pending = max_pending or 2 * workers
+
+  pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_initialize)
+  try:
+
+    # Bound the number of submitted jobs, and in ordered mode the number of
+    # finished results waiting for an earlier job.
+    pending, finished = {}, {}
+    submitted, following = 0, 0
+
+    while following < len(jobs):
+
+      while submitted < len(jobs) and len(pending) < max_pending and (not ordered or submitted < following + max_pending):
+        pending[pool.submit(render, jobs[submitted], submitted)] = submitted
+        submitted += 1
+
+      # A worker that dies (e.g. os._exit or a crash in native code) breaks
+      # the pool and every job in it. Those jobs fail, and the rest go to a
+      # new pool.
+      done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+      if any(isinstance(future.exception(), concurrent.futures.process.BrokenProcessPool) for future in done):
+        done, _ = concurrent.futures.wait(pending)
+        pool.shutdown(wait=False)
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_initialize)
+
+      for future in done:
+        index = pending.pop(future)
+        try:
+          result = future.result()
+        except Exception:
+          result = Result(index, path=jobs[index].path, error=traceback.format_exc())
+        if ordered:
+          finished[index] = result
+        else:
+          following += 1
+          yield result
+
+      while ordered and following in finished:
+        yield finished.pop(following)
+        following += 1
+
+  finally:
+    pool.shutdown()
@@ -1,35 +1,50 @@
+from .geometry import Geometry
+
+
 class Spacing:
 
-  def __init__(self, left=None, right=None, top=None, bottom=None):
+  __slots__ = ('_geometry', '_index')
+
+  def __init__(self, left=None, right=None, top=None, bottom=None, geometry=None, index=None):
+
+    if geometry is None:
+      geometry = Geometry(1, 1)
+      index = (0, 0)
+    self._geometry = geometry
+    self._index = index
+
+    if left is not None:
+      self.set_left(left)
+    if right is not None:
+      self.set_right(right)
+    if top is not None:
+      self.set_top(top)
+    if bottom is not None:
+      self.set_bottom(bottom)
 
-    self.set_left(left or 0.0)
-    self.set_right(right or 0.0)
-    self.set_top(top or 0.0)
-    self.set_bottom(bottom or 0.0)
-  
   def set_left(self, left):
-    self._left = left
+    self._geometry.left[self._index] = left
 
   def left(self):
-    return self._left
-  
+    return float(self._geometry.left[self._index])
+
   def set_right(self, right):
-    self._right = right
+    self._geometry.right[self._index] = right
 
   def right(self):
-    return self._right
+    return float(self._geometry.right[self._index])
 
   def set_top(self, top):
-    self._top = top
+    self._geometry.top[self._index] = top
 
   def top(self):
-    return self._top
+    return float(self._geometry.top[self._index])
 
   def set_bottom(self, bottom):
-    self._bottom = bottom  
+    self._geometry.bottom[self._index] = bottom
 
   def bottom(self):
-    return self._bottom
+    return float(self._geometry.bottom[self._index])
 
   def __repr__(self):
-    return f'Spacing(left={self.left()}, right={self.right()}, top={self.top()}, bottom={self.bottom()})'
\ No newline at end of file
+    return f'Spacing(left={self.left()}, right={self.right()}, top={self.top()}, bottom={self.bottom()})'
@@ -0,0 +1,42 @@
+from .util import LRUCache, lazy_type
+
+
+@lazy_type
+def renderer_type():
+  from matplotlib.backends.backend_agg import RendererAgg
+
+  class MeasuringRenderer(RendererAgg):
+
+    def get_text_width_height_descent(self, s, prop, ismath):
+      return self.text_cache.measure(super().get_text_width_height_descent, s, prop, ismath, self.dpi)
+
+  return MeasuringRenderer
+
+
+class TextCache(LRUCache):
+
+  def __init__(self, maxsize=4096):
+    super().__init__(maxsize)
+
+  @staticmethod
+  def key(s, prop, ismath, dpi):
+    # Metrics are measured before rotation, so rotated labels share entries
+    # with unrotated ones.
+    return (s, prop.copy(), ismath, float(dpi))
+
+  def measure(self, function, s, prop, ismath, dpi):
+    key = self.key(s, prop, ismath, dpi)
+    metrics = self.get(key)
+    if metrics is None:
+      metrics = function(s, prop, ismath)
+      self.put(key, metrics)
+    return metrics
+
+  def renderer(self, dpi):
+    # Text extents do not depend on the canvas size, so a 1x1 canvas suffices.
+    renderer = renderer_type()(1, 1, dpi)
+    renderer.text_cache = self
+    return renderer
+
+
+default_text_cache = TextCache()
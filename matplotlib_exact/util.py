@@ -0,0 +1,53 @@
+import collections
+import functools
+
+
+def lazy_type(define):
+  # Subclasses of matplotlib classes are defined on first use so that
+  # importing matplotlib_exact does not import matplotlib.
+  return functools.cache(define)
+
+
+class LRUCache:
+
+  def __init__(self, maxsize):
+
+    self._maxsize = maxsize
+    self._entries = collections.OrderedDict()
+    self._hits = 0
+    self._misses = 0
+
+  def get(self, key, *args):
+    value = self._find(key, *args)
+    if value is None:
+      self._misses += 1
+      return None
+    self._entries.move_to_end(key)
+    self._hits += 1
+    return value
+
+  def put(self, key, value):
+    self._store(key, value)
+
+  def _find(self, key):
+    return self._entries.get(key)
+
+  def _store(self, key, value):
+    self._entries[key] = value
+    self._entries.move_to_end(key)
+    while len(self._entries) > self._maxsize:
+      self._entries.popitem(last=False)
+
+  def clear(self):
+    self._entries.clear()
+    self._hits = 0
+    self._misses = 0
+
+  def stats(self):
+    return dict(hits=self._hits, misses=self._misses, size=len(self._entries), maxsize=self._maxsize)
+
+  def __len__(self):
+    return len(self._entries)
+
+  def __repr__(self):
+    return f'{type(self).__name__}(size={len(self)}, maxsize={self._maxsize})'